@@ -1,37 +1,62 @@
 import atexit
+import copy
 import datetime
+import hashlib
 import json
 import logging
+import logging.handlers
 import os
+import queue
 import random
 import threading
 import time
-from typing import Dict, Any, List, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
 
-from flask import Flask, render_template, request, redirect, url_for
-from pyvirtualdisplay import Display
+from flask import Flask, make_response, request, redirect, url_for
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Local imports
-from bot_logic import BotManager, send_html_email
+from bot_logic import CHECK_ABORTED, HEADLESS, BotManager, BrowserPool, close_smtp, kill_zombie_chrome, send_html_email
 
 # -------------------------------------------------------------------------
 # Logging Setup
 # -------------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
+# Callers only enqueue records; a single listener thread does the disk/console writes
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_file = logging.handlers.RotatingFileHandler('bot.log', maxBytes=5_000_000, backupCount=3, delay=True)
+_log_console = logging.StreamHandler()
+for _handler in (_log_file, _log_console):
+    _handler.setFormatter(_log_formatter)
+_log_queue: queue.Queue = queue.Queue(-1)
+_log_listener = logging.handlers.QueueListener(
+    _log_queue, _log_file, _log_console, respect_handler_level=True
 )
+_log_listener.start()
+
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# The listener's handlers apply the real format; pass the bare message through
+# so basicConfig's default format isn't baked into every record
+_log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+
+logging.basicConfig(level=logging.INFO, handlers=[_log_queue_handler])
 logger = logging.getLogger(__name__)
 
 # -------------------------------------------------------------------------
 # Application Configuration
 # -------------------------------------------------------------------------
 app = Flask(__name__)
+# Templates are fetched once at import; skip Jinja's per-request mtime checks
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
 CONFIG_FILE = 'config.json'
+# Volatile runtime state lives apart from settings so status ticks stay tiny
+STATUS_FILE = 'status.json'
 
 DEFAULT_CONFIG = {
     "bags": {},
@@ -39,16 +64,43 @@ DEFAULT_CONFIG = {
     "min_interval_minutes": 20,
     "max_interval_minutes": 40,
     "proxy": "",
+    "url_blacklist": {},  # { "url": epoch_seconds }
+}
+
+DEFAULT_STATUS = {
     "blocked_count": 0,
     "success_count": 0,
     "last_blocked_time": None,
-    "url_blacklist": {},  # { "url": "iso_timestamp" }
-    "last_run_status": "Waiting to start..."
+    "last_run_time": None,
+    "last_run_status": "Waiting to start...",
+    "last_backoff_seconds": None,  # feeds the next decorrelated-jitter draw
 }
 
+BLACKLIST_TTL_SECONDS = 24 * 60 * 60
+# Entries only need hour-level precision, so pruning every few cycles is plenty
+PRUNE_EVERY_N_CYCLES = 6
+# Pause before retrying a config/status write that failed
+FLUSH_RETRY_SECONDS = 30
+
+# Check product pages with plain HTTP requests, opening a browser only for
+# pages that answer with a challenge
+FAST_CHECK = os.getenv("FAST_CHECK", "0") == "1"
+# Browsers checking URLs in parallel; each is a full Chrome, so keep it small
+POOL_SIZE = max(1, int(os.getenv("HERMES_POOL_SIZE", "1")))
+
 # Global State
+# A BrowserPool when POOL_SIZE > 1, or a FastChecker when FAST_CHECK
 bot_manager: Optional[BotManager] = None
-virtual_display: Optional[Display] = None
+# Set by routes to cut the worker's inter-cycle sleep short
+_wake = threading.Event()
+# Set by routes that need a fresh browser; only the worker tears it down
+_restart_requested = threading.Event()
+# (items, recipients) waiting for the email sender thread
+_email_queue: queue.Queue = queue.Queue()
+# Worker-only RNG: no contention with other users of the module-level one,
+# and it can be seeded to make backoff/interval timing reproducible
+_rng = random.Random()
+virtual_display = None  # pyvirtualdisplay.Display, only when not headless
 
 
 # -------------------------------------------------------------------------
@@ -56,7 +108,12 @@ virtual_display: Optional[Display] = None
 # -------------------------------------------------------------------------
 def start_display():
     global virtual_display
+    if HEADLESS:
+        return  # Headless Chrome renders without an X server
+
     try:
+        from pyvirtualdisplay import Display
+
         logger.info("Starting virtual display...")
         virtual_display = Display(visible=0, size=(1920, 1080))
         virtual_display.start()
@@ -73,261 +130,598 @@ def stop_display():
         except Exception as e:
             logger.error(f"Error stopping display: {e}")
 
-atexit.register(stop_display)
-
 
 # -------------------------------------------------------------------------
 # Config Management
 # -------------------------------------------------------------------------
-def load_config() -> Dict[str, Any]:
-    if not os.path.exists(CONFIG_FILE):
-        return DEFAULT_CONFIG.copy()
+def _json_loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+def _json_dumps(data: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+class ConfigStore:
+    """
+    In-memory JSON document (config or status) shared by the worker and
+    the Flask routes.
+
+    Reads hand out deep-copied snapshots; writes go through update() under
+    an RLock and only mark the store dirty. A daemon thread wakes on the
+    first dirty mark, waits `flush_delay` seconds so bursts of edits
+    coalesce, then writes once. The file's mtime is still checked so hand
+    edits are picked up.
+    """
+
+    def __init__(self, path: str, defaults: Dict[str, Any], flush_delay: float = 0.5,
+                 migrate: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 build_index: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.path = path
+        self.defaults = defaults
+        self.flush_delay = flush_delay
+        self.migrate = migrate
+        self.build_index = build_index
+        # Derived lookup structure, rebuilt on every (re)load from disk and kept
+        # in sync by mutators in between. Only touch it inside update().
+        self.index: Any = None
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._mtime: Optional[int] = None
+        self._dirty = False
+        self._dirty_event = threading.Event()
+        # Bumped on every change (in-memory or on disk) so views can cache on it
+        self._version = 0
+        # Bytes of the last write, to skip flushes that would not change the file
+        self._last_payload: Optional[bytes] = None
+        # Shared read-only copy handed out by view(), tagged with its version
+        self._view: Optional[Dict[str, Any]] = None
+        self._view_version: Optional[int] = None
+
+    def _read_file(self) -> Dict[str, Any]:
+        config = copy.deepcopy(self.defaults)
+        try:
+            with open(self.path, 'rb') as f:
+                config.update(_json_loads(f.read()))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Error loading config: {e}. Using defaults.")
 
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            data = json.load(f)
-            config = DEFAULT_CONFIG.copy()
-            config.update(data)
-            # Ensure complex defaults exist if missing in JSON
-            if "url_blacklist" not in config:
-                config["url_blacklist"] = {}
-            return config
-    except (json.JSONDecodeError, Exception) as e:
-        logger.error(f"Error loading config: {e}. Using defaults.")
-        return DEFAULT_CONFIG.copy()
-
-def save_config(data: Dict[str, Any]):
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        logger.error(f"Failed to save config: {e}")
+        if self.migrate:
+            self.migrate(config)
+        return config
+
+    def _refresh(self):
+        """Re-read the file if it changed on disk and we hold no unsaved edits."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if self._data is None or (mtime != self._mtime and not self._dirty):
+            self._data = self._read_file()
+            self._mtime = mtime
+            self._last_payload = None
+            if self.build_index:
+                self.index = self.build_index(self._data)
+            self._version += 1
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def get(self) -> Dict[str, Any]:
+        """Return a private snapshot of the current config."""
+        with self._lock:
+            self._refresh()
+            return copy.deepcopy(self._data)
+
+    def view(self) -> Dict[str, Any]:
+        """
+        Return a snapshot shared between callers, copied only when the
+        document has changed since the last call. Callers must not mutate it;
+        use get() for a private copy.
+        """
+        with self._lock:
+            self._refresh()
+            if self._view_version != self._version:
+                self._view = copy.deepcopy(self._data)
+                self._view_version = self._version
+            return self._view
+
+    @contextmanager
+    def transact(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the live document under the lock. Everything changed inside the
+        block lands in the same flush; if the block raises, the document (and
+        index) are restored to their state before the block and nothing is
+        scheduled.
+        """
+        with self._lock:
+            self._refresh()
+            backup = copy.deepcopy(self._data)
+            try:
+                yield self._data
+            except BaseException:
+                # Don't leave a half-applied edit live for the next flush to pick up
+                self._data = backup
+                if self.build_index:
+                    self.index = self.build_index(self._data)
+                raise
+            self._version += 1
+            self._dirty = True
+            self._dirty_event.set()
+
+    def update(self, mutator: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Apply `mutator` to the live config under the lock and schedule a flush."""
+        with self.transact() as data:
+            return mutator(data)
+
+    def flush(self) -> bool:
+        """Write pending changes to disk (no-op when clean). False if the write failed."""
+        with self._lock:
+            # Cleared under the lock, before writing: an update() landing after
+            # this sets it again and gets its own pass
+            self._dirty_event.clear()
+            if not self._dirty:
+                return True
+            if not self._atomic_write(self._data):
+                # Stay dirty (which also keeps _refresh from reloading over the
+                # edits) and re-arm the flusher so the write is retried
+                self._dirty_event.set()
+                return False
+            self._dirty = False
+            return True
+
+    def _atomic_write(self, data: Dict[str, Any]) -> bool:
+        tmp_path = self.path + ".tmp"
+        try:
+            # Encode up-front so the file is written with a single syscall
+            payload = _json_dumps(data)
+            if payload == self._last_payload:
+                return True  # Mutations cancelled out (e.g. a toggle clicked twice)
+
+            with open(tmp_path, 'wb', buffering=0) as f:
+                f.write(payload)
+                os.fsync(f.fileno())
+            # Atomic swap: readers never observe a half-written file
+            os.replace(tmp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._last_payload = payload
+            return True
+        except Exception as e:
+            logger.error(f"Failed to save config: {e}")
+            # Don't leave a partial temp file lying next to the real one
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def _flush_loop(self):
+        while True:
+            self._dirty_event.wait()
+            time.sleep(self.flush_delay)
+            if not self.flush():
+                # Disk full or read-only: don't retry (and log) in a tight loop
+                time.sleep(FLUSH_RETRY_SECONDS)
+
+    def start(self):
+        threading.Thread(target=self._flush_loop, name="config-flusher", daemon=True).start()
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for storage and duplicate checks."""
+    parts = urlsplit(url.strip())
+    # Scheme and host are case-insensitive; the path is left as-is
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                       parts.path.rstrip('/'), parts.query, parts.fragment))
+
+def migrate_config(config: Dict[str, Any]):
+    """Bring a freshly loaded config up to the current storage format."""
+    # URLs are stored normalized so duplicate checks are plain membership tests
+    for data in config['bags'].values():
+        # dict.fromkeys drops duplicates that only differed in form, keeping order
+        data['urls'] = list(dict.fromkeys(normalize_url(u) for u in data.get('urls', [])))
+
+    # Blacklist timestamps used to be ISO strings; they are epoch seconds now.
+    # Keys are normalized like the URLs above so build_check_plan still
+    # matches entries recorded under the raw form; the newest one wins.
+    blacklist = {}
+    for url, ts in config['url_blacklist'].items():
+        if isinstance(ts, str):
+            try:
+                ts = datetime.datetime.fromisoformat(ts).timestamp()
+            except ValueError:
+                continue  # If format is bad, drop it
+        url = normalize_url(url)
+        blacklist[url] = max(ts, blacklist.get(url, ts))
+    config['url_blacklist'] = blacklist
+
+
+def build_url_index(config: Dict[str, Any]) -> Dict[str, Set[str]]:
+    """Per-group URL sets so duplicate checks don't scan the URL lists."""
+    return {name: set(data.get('urls', [])) for name, data in config['bags'].items()}
+
+
+config_store = ConfigStore(CONFIG_FILE, DEFAULT_CONFIG, migrate=migrate_config,
+                           build_index=build_url_index)
+status_store = ConfigStore(STATUS_FILE, DEFAULT_STATUS)
+
+def migrate_status_file():
+    """One-shot move of runtime status fields out of config.json into status.json."""
+    if os.path.exists(STATUS_FILE):
+        return
+
+    legacy = config_store.get()
+    status_store.update(lambda status: status.update(
+        {k: legacy[k] for k in DEFAULT_STATUS if k in legacy}
+    ))
+
+    def drop_status_fields(config):
+        for key in DEFAULT_STATUS:
+            config.pop(key, None)
+
+    config_store.update(drop_status_fields)
 
 
 # -------------------------------------------------------------------------
 # Background Worker Logic
 # -------------------------------------------------------------------------
-def calculate_backoff_delay(blocked_count: int) -> int:
-    if blocked_count <= 0:
-        return 0
-    base_minutes = 5
-    backoff_minutes = min(base_minutes * (2 ** (blocked_count - 1)), 120)
-    jitter = random.uniform(0.8, 1.2)
-    return int(backoff_minutes * 60 * jitter)
-
-def prune_blacklist(config: Dict[str, Any]) -> Dict[str, Any]:
-    """Remove URLs from blacklist that are older than 24 hours."""
-    now = datetime.datetime.now()
+BACKOFF_BASE_SECONDS = 5 * 60
+BACKOFF_CAP_SECONDS = 120 * 60
+
+def calculate_backoff_delay(prev_seconds: Optional[float]) -> int:
+    """
+    Decorrelated jitter: each delay is drawn from [base, 3 * previous delay],
+    capped, so consecutive retries neither cluster nor march in lockstep.
+    """
+    prev = prev_seconds or BACKOFF_BASE_SECONDS
+    return int(min(BACKOFF_CAP_SECONDS, _rng.uniform(BACKOFF_BASE_SECONDS, prev * 3)))
+
+def prune_blacklist(config: Dict[str, Any]) -> bool:
+    """Remove URLs from blacklist that are older than 24 hours. Returns True if any were removed."""
     blacklist = config.get("url_blacklist", {})
-    new_blacklist = {}
-    modified = False
-
-    for url, timestamp_str in blacklist.items():
-        try:
-            blocked_time = datetime.datetime.fromisoformat(timestamp_str)
-            if now - blocked_time < datetime.timedelta(hours=24):
-                new_blacklist[url] = timestamp_str
-            else:
-                logger.info(f"Removing {url} from blacklist (Expired)")
-                modified = True
-        except ValueError:
-            # If format is bad, remove it
-            modified = True
-
-    if modified:
-        config["url_blacklist"] = new_blacklist
-        save_config(config)
+    cutoff = time.time() - BLACKLIST_TTL_SECONDS
+    new_blacklist = {url: ts for url, ts in blacklist.items() if ts > cutoff}
+
+    if len(new_blacklist) == len(blacklist):
+        return False
+
+    logger.info(f"Removed {len(blacklist) - len(new_blacklist)} expired URL(s) from blacklist")
+    config["url_blacklist"] = new_blacklist
+    return True
+
+def build_check_plan(config: Dict[str, Any]) -> Tuple[Tuple[str, Tuple[str, ...]], ...]:
+    """
+    Flatten the bag config into ((group_name, (url, ...)), ...) for run_check.
+    Paused groups, live-blacklisted URLs and groups left empty are dropped here,
+    so the browser loop never has to look at them.
+    """
+    cutoff = time.time() - BLACKLIST_TTL_SECONDS
+    blacklisted = {url for url, ts in config.get('url_blacklist', {}).items() if ts > cutoff}
+
+    plan = []
+    for group_name, data in config.get('bags', {}).items():
+        if not data.get('active', True):
+            continue
+        urls = tuple(u for u in data.get('urls', []) if u not in blacklisted)
+        if urls:
+            plan.append((group_name, urls))
+    return tuple(plan)
+
+def email_sender():
+    """Send queued notifications so SMTP latency never holds up a check cycle."""
+    while True:
+        items, recipients = _email_queue.get()
+        send_html_email(items, recipients)
+
+def wait_out_backoff(delay: float):
+    """
+    Sleep for `delay` seconds, returning early only if the block count was
+    reset from the dashboard. Other wake-ups keep waiting out the backoff.
+    """
+    # Wake-ups from before the backoff started must not cut it short
+    _wake.clear()
+    deadline = time.monotonic() + delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if _wake.wait(timeout=remaining):
+            _wake.clear()
+            if status_store.view().get('blocked_count', 0) == 0:
+                logger.info("Backoff cancelled by a stats reset.")
+                return
+
+def drop_browser():
+    """Quit the current browser; the worker starts a new one on its next check."""
+    global bot_manager
+    if bot_manager:
+        bot_manager.cleanup()
+        bot_manager = None
 
-    return config
+def request_browser_restart():
+    """Ask the worker to replace the browser, cutting a running check short."""
+    _restart_requested.set()
+    # One read: the worker's drop_browser() may clear the global meanwhile
+    manager = bot_manager
+    if manager:
+        manager.abort()
+    _wake.set()
 
 def background_worker():
     global bot_manager
     logger.info("Background worker started")
     consecutive_errors = 0
+    cycle = 0
 
     while True:
-        config = load_config()
+        # One snapshot for the whole check; live blacklist entries are left out
+        # of the check plan, expired ones are pruned with this cycle's results
+        config = config_store.view()
+        status = status_store.view()
+        prune_due = cycle % PRUNE_EVERY_N_CYCLES == 0
+        cycle += 1
 
-        # 0. Prune Blacklist
-        config = prune_blacklist(config)
+        backed_off = False
+        outcome = None
+        error = None
 
         try:
             # 1. Handle Blocking / Backoff
-            blocked_count = config.get('blocked_count', 0)
+            blocked_count = status.get('blocked_count', 0)
             if blocked_count > 0:
-                delay = calculate_backoff_delay(blocked_count)
+                delay = calculate_backoff_delay(status.get('last_backoff_seconds'))
                 logger.warning(f"⚠️ Backing off for {delay // 60} minutes due to blocks.")
-                config['last_run_status'] = f"Backing off ({delay // 60}m due to blocks)"
-                save_config(config)
-                time.sleep(delay)
-
-                # Decay block count
-                config = load_config()
-                config['blocked_count'] = max(0, config['blocked_count'] - 1)
-                save_config(config)
+                # Published up-front so the dashboard shows it during the sleep
+                message = f"Backing off ({delay // 60}m due to blocks)"
+                status_store.update(lambda s: s.update(last_run_status=message,
+                                                       last_backoff_seconds=delay))
+                wait_out_backoff(delay)
+                backed_off = True
 
             # 2. Initialize Bot if needed
+            if _restart_requested.is_set():
+                _restart_requested.clear()
+                drop_browser()
+
             if bot_manager is None:
-                logger.info("Initializing BotManager...")
-                bot_manager = BotManager(config.get('proxy'))
+                if FAST_CHECK:
+                    from fast_check import FastChecker
+
+                    logger.info("Initializing FastChecker...")
+                    proxy = config.get('proxy')
+                    bot_manager = FastChecker(proxy, browser_factory=lambda: BotManager(proxy))
+                elif POOL_SIZE > 1:
+                    logger.info(f"Initializing BrowserPool of {POOL_SIZE}...")
+                    bot_manager = BrowserPool(config.get('proxy'), POOL_SIZE)
+                else:
+                    logger.info("Initializing BotManager...")
+                    bot_manager = BotManager(config.get('proxy'))
 
             # 3. Run Check Cycle
-            config['last_run_status'] = "Checking stock..."
-            save_config(config)
-
-            # Pass blacklist to run_check
-            found_items, was_blocked, culprit_url = bot_manager.run_check(
-                config.get('bags', {}),
-                config.get('url_blacklist', {})
-            )
-
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            config = load_config()
+            outcome = bot_manager.run_check(build_check_plan(config))
+        except Exception as e:
+            error = e
 
-            if was_blocked:
-                # Update general stats
-                config['blocked_count'] = config.get('blocked_count', 0) + 1
-                config['last_blocked_time'] = timestamp
+        # Apply this cycle's results onto the live state in one transaction
+        # each, so edits made from the UI during the check are kept.
+        restart_browser = False
+        culprit_url = None
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-                # Update Blacklist if a specific URL caused it
-                if culprit_url:
-                    logger.warning(f"🚫 Blacklisting URL for 24h: {culprit_url}")
-                    config["url_blacklist"][culprit_url] = datetime.datetime.now().isoformat()
-                    config['last_run_status'] = f"⚠️ BLOCKED by {culprit_url} (Count: {config['blocked_count']})"
-                else:
-                    config['last_run_status'] = f"⚠️ BLOCKED globally (Count: {config['blocked_count']})"
+        with status_store.transact() as status:
+            if backed_off:
+                # Decay block count
+                status['blocked_count'] = max(0, status.get('blocked_count', 0) - 1)
+
+            if error is not None:
+                consecutive_errors += 1
+                logger.error(f"Worker Exception: {error}", exc_info=error)
+                status['last_run_status'] = f"Error: {str(error)[:50]}"
+
+                if consecutive_errors >= 3:
+                    logger.critical("Too many errors. Restarting BotManager.")
+                    restart_browser = True
+                    consecutive_errors = 0
+            elif outcome is CHECK_ABORTED:
+                # Cut short for a restart: neither a success nor a block
+                status['last_run_status'] = "Check interrupted (browser restart)"
+            else:
+                found_items, was_blocked, culprit_url = outcome
 
-                logger.error(f"Bot blocked. Total blocks: {config['blocked_count']}")
+                if was_blocked:
+                    # Update general stats
+                    status['blocked_count'] = status.get('blocked_count', 0) + 1
+                    status['last_blocked_time'] = timestamp
 
-                if bot_manager:
-                    bot_manager.cleanup()
-                    bot_manager = None
+                    if culprit_url:
+                        logger.warning(f"🚫 Blacklisting URL for 24h: {culprit_url}")
+                        status['last_run_status'] = f"⚠️ BLOCKED by {culprit_url} (Count: {status['blocked_count']})"
+                    else:
+                        status['last_run_status'] = f"⚠️ BLOCKED globally (Count: {status['blocked_count']})"
 
-            else:
-                # Success
-                config['success_count'] = config.get('success_count', 0) + 1
-                config['blocked_count'] = max(0, config.get('blocked_count', 0) - 1)
-                config['last_run_time'] = timestamp
-                config['last_run_status'] = f"✓ Healthy (Found: {len(found_items)})"
+                    logger.error(f"Bot blocked. Total blocks: {status['blocked_count']}")
+                    restart_browser = True
 
-                if found_items:
-                    logger.info(f"🎉 Found {len(found_items)} items! Sending email.")
-                    send_html_email(found_items, config.get('emails', []))
+                else:
+                    # Success
+                    status['success_count'] = status.get('success_count', 0) + 1
+                    status['blocked_count'] = max(0, status.get('blocked_count', 0) - 1)
+                    status['last_run_time'] = timestamp
+                    status['last_run_status'] = f"✓ Healthy (Found: {len(found_items)})"
+                    consecutive_errors = 0
+
+            if status.get('blocked_count', 0) == 0:
+                # Fully recovered: the next block starts again from the base delay
+                status['last_backoff_seconds'] = None
+
+        # config.json is only rewritten when the blacklist actually changes
+        if prune_due or culprit_url:
+            with config_store.transact() as config:
+                if prune_due:
+                    prune_blacklist(config)
+                # Blacklist the specific URL that caused a block
+                if culprit_url:
+                    config["url_blacklist"][normalize_url(culprit_url)] = time.time()
 
-                consecutive_errors = 0
+        config = config_store.view()
 
-            save_config(config)
+        # Slow side effects run outside the store lock
+        if restart_browser or _restart_requested.is_set():
+            _restart_requested.clear()
+            drop_browser()
 
-        except Exception as e:
-            consecutive_errors += 1
-            logger.error(f"Worker Exception: {e}", exc_info=True)
-            config = load_config()
-            config['last_run_status'] = f"Error: {str(e)[:50]}"
-            save_config(config)
-
-            if consecutive_errors >= 3:
-                logger.critical("Too many errors. Restarting BotManager.")
-                if bot_manager:
-                    bot_manager.cleanup()
-                    bot_manager = None
-                consecutive_errors = 0
+        if error is None and outcome is not CHECK_ABORTED:
+            found_items, was_blocked, _ = outcome
+            if found_items and not was_blocked:
+                logger.info(f"🎉 Found {len(found_items)} items! Sending email.")
+                _email_queue.put((found_items, config.get('emails', [])))
 
         # 4. Wait for next cycle
-        config = load_config()
         min_m = config.get('min_interval_minutes', 20)
         max_m = config.get('max_interval_minutes', 40)
-        wait_sec = random.randint(min_m * 60, max_m * 60)
+        wait_sec = _rng.randint(min_m * 60, max_m * 60)
         logger.info(f"Sleeping for {wait_sec // 60}m {wait_sec % 60}s...")
-        time.sleep(wait_sec)
+        # Only wake-ups during the sleep cut it short; edits made while the
+        # check ran are picked up by the next cycle's snapshot anyway
+        _wake.clear()
+        if _wake.wait(timeout=wait_sec):
+            logger.info("Woken early by a settings change.")
 
 
 # -------------------------------------------------------------------------
 # Flask Routes
 # -------------------------------------------------------------------------
+@app.template_filter('datetime')
+def format_timestamp(value):
+    try:
+        return datetime.datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError, OSError):
+        return value
+
+# Compiled once (after the filters above are registered) and rendered directly
+_INDEX_TMPL = app.jinja_env.get_template('index.html')
+# (version, html, etag) of the rendered dashboard, reused until the config
+# changes. Replaced in one assignment so concurrent requests never pair one
+# render's ETag with another's body.
+_index_cache: Optional[Tuple[Any, str, str]] = None
+
 @app.route('/')
 def index():
-    return render_template('index.html', config=load_config())
+    global _index_cache
+    version = (config_store.version, status_store.version)
+    cached = _index_cache
+    if cached is None or cached[0] != version:
+        # The template reads settings and status from a single mapping
+        view = {**config_store.view(), **status_store.view()}
+        html = _INDEX_TMPL.render(config=view)
+        # Content hash, so tags stay valid across restarts (versions don't)
+        cached = (version, html, hashlib.sha1(html.encode()).hexdigest())
+        _index_cache = cached
+
+    _, html, etag = cached
+    response = make_response(html)
+    response.set_etag(etag)
+    # Always revalidate; the auto-refresh then gets a bodiless 304 when idle
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 @app.route('/update_settings', methods=['POST'])
 def update_settings():
-    config = load_config()
     try:
-        config['min_interval_minutes'] = int(request.form.get('min_time', 20))
-        config['max_interval_minutes'] = int(request.form.get('max_time', 40))
-
-        emails_str = request.form.get('emails', '')
-        config['emails'] = [e.strip() for e in emails_str.split(',') if e.strip()]
+        min_time = int(request.form.get('min_time', 20))
+        max_time = int(request.form.get('max_time', 40))
+    except ValueError:
+        logger.warning("Invalid input in settings update")
+        return redirect(url_for('index'))
 
-        new_proxy = request.form.get('proxy', '').strip()
-        if new_proxy != config.get('proxy', ''):
-            logger.info("Proxy updated. Triggering browser restart.")
-            global bot_manager
-            if bot_manager:
-                bot_manager.cleanup()
-                bot_manager = None
+    emails_str = request.form.get('emails', '')
+    new_proxy = request.form.get('proxy', '').strip()
 
+    def apply(config):
+        proxy_changed = new_proxy != config.get('proxy', '')
+        config['min_interval_minutes'] = min_time
+        config['max_interval_minutes'] = max_time
+        config['emails'] = [e.strip() for e in emails_str.split(',') if e.strip()]
         config['proxy'] = new_proxy
-        save_config(config)
-    except ValueError:
-        logger.warning("Invalid input in settings update")
+        return proxy_changed
 
+    if config_store.update(apply):
+        logger.info("Proxy updated. Triggering browser restart.")
+        request_browser_restart()
+
+    _wake.set()
     return redirect(url_for('index'))
 
 @app.route('/add_bag_group', methods=['POST'])
 def add_bag_group():
-    config = load_config()
     name = request.form.get('bag_name', '').strip()
-    if name and name not in config['bags']:
-        config['bags'][name] = {"active": True, "urls": []}
-        save_config(config)
+
+    def apply(config):
+        if name and name not in config['bags']:
+            config['bags'][name] = {"active": True, "urls": []}
+            config_store.index[name] = set()
+
+    config_store.update(apply)
     return redirect(url_for('index'))
 
 @app.route('/delete_bag_group/<name>')
 def delete_bag_group(name):
-    config = load_config()
-    if name in config['bags']:
-        del config['bags'][name]
-        save_config(config)
+    def apply(config):
+        config['bags'].pop(name, None)
+        config_store.index.pop(name, None)
+
+    config_store.update(apply)
     return redirect(url_for('index'))
 
 @app.route('/toggle_bag_group/<name>')
 def toggle_bag_group(name):
-    config = load_config()
-    if name in config['bags']:
-        config['bags'][name]['active'] = not config['bags'][name].get('active', True)
-        save_config(config)
+    def apply(config):
+        if name in config['bags']:
+            config['bags'][name]['active'] = not config['bags'][name].get('active', True)
+
+    config_store.update(apply)
+    _wake.set()
     return redirect(url_for('index'))
 
 @app.route('/add_url_to_group', methods=['POST'])
 def add_url_to_group():
-    config = load_config()
     group = request.form.get('group_name')
-    url = request.form.get('url', '').strip().rstrip('/')
+    url = normalize_url(request.form.get('url', ''))
 
-    if group in config['bags'] and url:
-        urls = config['bags'][group]['urls']
-        if url not in [u.rstrip('/') for u in urls]:
-            config['bags'][group]['urls'].append(url)
-            save_config(config)
+    def apply(config):
+        if group in config['bags'] and url:
+            seen = config_store.index[group]
+            if url not in seen:
+                config['bags'][group]['urls'].append(url)
+                seen.add(url)
 
+    config_store.update(apply)
+    _wake.set()
     return redirect(url_for('index'))
 
 @app.route('/remove_url', methods=['POST'])
 def remove_url():
-    config = load_config()
     group = request.form.get('group_name')
-    url = request.form.get('url')
+    url = normalize_url(request.form.get('url', ''))
 
-    if group in config['bags'] and url in config['bags'][group]['urls']:
-        config['bags'][group]['urls'].remove(url)
-        save_config(config)
+    def apply(config):
+        if group in config['bags'] and url in config_store.index[group]:
+            config['bags'][group]['urls'].remove(url)
+            config_store.index[group].discard(url)
 
+    config_store.update(apply)
     return redirect(url_for('index'))
 
 @app.route('/test_email')
 def test_email():
-    config = load_config()
-    recipients = config.get('emails', [])
+    recipients = config_store.view().get('emails', [])
 
     if not recipients:
         return redirect(url_for('index'))
@@ -341,47 +735,103 @@ def test_email():
     }
 
     logger.info(f"Sending test email to {recipients}")
-    send_html_email([dummy_item], recipients)
+    _email_queue.put(([dummy_item], recipients))
     return redirect(url_for('index'))
 
 @app.route('/reset_stats')
 def reset_stats():
-    config = load_config()
-    config.update({
+    status_store.update(lambda status: status.update({
         'blocked_count': 0,
         'success_count': 0,
         'last_blocked_time': None,
-        'url_blacklist': {} # Also clearing blacklist on reset might be desired
-    })
-    save_config(config)
+        'last_backoff_seconds': None,
+    }))
+    # Also clearing blacklist on reset might be desired
+    config_store.update(lambda config: config.update(url_blacklist={}))
+    _wake.set()
     return redirect(url_for('index'))
 
 @app.route('/clear_blacklist')
 def clear_blacklist():
-    config = load_config()
-    config['url_blacklist'] = {}
-    save_config(config)
+    config_store.update(lambda config: config.update(url_blacklist={}))
     logger.info("Manual blacklist clear triggered by user.")
+    _wake.set()
     return redirect(url_for('index'))
 
 @app.route('/restart_browser')
 def restart_browser():
-    global bot_manager
-    if bot_manager:
-        logger.info("Manual browser restart triggered.")
-        bot_manager.cleanup()
-        bot_manager = None
+    logger.info("Manual browser restart triggered.")
+    request_browser_restart()
     return redirect(url_for('index'))
 
 
+# -------------------------------------------------------------------------
+# Startup / Shutdown
+# -------------------------------------------------------------------------
+_startup_lock = threading.Lock()
+_started = False
+
+def start_services():
+    """Start the display, config flushers and bot worker - once per process."""
+    global _started
+    with _startup_lock:
+        if _started:
+            return
+        _started = True
+
+        kill_zombie_chrome()
+        start_display()
+        migrate_status_file()
+        config_store.start()
+        status_store.start()
+
+        threading.Thread(target=email_sender, name="email-sender", daemon=True).start()
+        logger.info("Starting background worker thread...")
+        threading.Thread(target=background_worker, name="bot-worker", daemon=True).start()
+
+_shutdown_lock = threading.Lock()
+_shutdown_done = False
+
+def shutdown():
+    """Flush config, quit the browser, stop the display, drain logs - once, in that order."""
+    global _shutdown_done
+    with _shutdown_lock:
+        if _shutdown_done:
+            return
+        _shutdown_done = True
+
+        def quit_browser():
+            # One read: the worker's drop_browser() may clear the global meanwhile
+            manager = bot_manager
+            if manager:
+                manager.abort()
+                manager.cleanup()
+
+        # Each step runs even if an earlier one fails. Chrome is quit before
+        # its display goes away so no browser outlives us.
+        for step in (config_store.flush, status_store.flush, quit_browser, close_smtp, stop_display):
+            try:
+                step()
+            except Exception as e:
+                logger.error(f"Shutdown step {step.__name__} failed: {e}", exc_info=e)
+
+        # Last, so messages logged by the steps above still reach bot.log
+        for step in (_log_listener.stop, _log_file.close):
+            try:
+                step()
+            except Exception:
+                pass  # Nowhere left to log it
+
+atexit.register(shutdown)
+
+
 # -------------------------------------------------------------------------
 # Entry Point
 # -------------------------------------------------------------------------
+# The bot worker is a per-process singleton, so serve from a single process
+# with a few threads (see wsgi.py for running under a WSGI server).
 if __name__ == '__main__':
-    start_display()
-
-    logger.info("Starting background worker thread...")
-    thread = threading.Thread(target=background_worker, daemon=True)
-    thread.start()
+    from waitress import serve
 
-    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
+    start_services()
+    serve(app, host='0.0.0.0', port=5000, threads=4)
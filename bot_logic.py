@@ -1,21 +1,209 @@
+import itertools
+import json
 import os
+import re
 import smtplib
 import time
 import tempfile
 import shutil
 import random
 import logging
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 from email.message import EmailMessage
-from typing import Optional, Dict, List, Tuple, Any
+from html import escape
+from typing import Optional, Dict, List, Sequence, Tuple, Any
 
+import psutil
 import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
 
 # Setup module logger
 logger = logging.getLogger(__name__)
 
+# Headless Chrome needs no X server. Set HEADLESS=0 to run a headed browser
+# inside an Xvfb display instead (app.py starts one) if the site starts
+# flagging headless sessions.
+HEADLESS = os.getenv("HEADLESS", "1") != "0"
+# Major version of the installed Chrome; PERSONAS' user agents should match it
+CHROME_VERSION = int(os.getenv("CHROME_VERSION", "143"))
+
+# Any of these means a product page has rendered far enough to be judged:
+# a cart button, the "no longer available" notice, or a captcha wall.
+# One script call per poll instead of an XPath lookup per condition.
+PAGE_READY_JS = """
+return [...document.querySelectorAll('button')].some(b => /add to cart/i.test(b.textContent))
+    || [...document.querySelectorAll("span[class*='message-info']")].some(e => /no longer available/i.test(e.textContent))
+    || !!document.querySelector("iframe[src*='captcha-delivery.com']");
+"""
+
+
+def _page_ready(driver) -> bool:
+    return driver.execute_script(PAGE_READY_JS)
+
+
+# Seconds to wait for _page_ready after driver.get()
+PAGE_READY_TIMEOUT = 8
+# Upper bound for driver.get(); with the eager strategy it returns at DOMContentLoaded
+PAGE_LOAD_TIMEOUT = 15
+# Upper bound for a probe script; they are synchronous and finish in milliseconds
+SCRIPT_TIMEOUT = 10
+
+# A URL checked this recently (listed in two groups, or a cycle restarted by
+# a settings change) reuses its last result instead of loading the page again
+RECENT_RESULT_TTL = 60
+RECENT_RESULT_MAX_AGE = 600
+_recent: Dict[str, Tuple[float, Optional[Dict]]] = {}  # url -> (monotonic ts, details)
+
+
+def _prune_recent():
+    cutoff = time.monotonic() - RECENT_RESULT_MAX_AGE
+    for url, (checked_at, _) in list(_recent.items()):
+        if checked_at < cutoff:
+            _recent.pop(url, None)
+
+# Availability (a visible, enabled "add to cart" button) plus the name, color
+# and image of a product page, read in a single script call
+PRODUCT_PROBE_JS = """
+const visible = (el) => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+const h1 = document.querySelector('h1');
+const color = document.querySelector("[class*='color'] span, [class*='Color'] span");
+const img = document.querySelector("img[src*='assets.hermes.com']");
+return {
+    available: [...document.querySelectorAll('button')].some(
+        b => /add to cart/i.test(b.textContent) && visible(b) && !b.disabled
+            && b.getAttribute('aria-disabled') !== 'true'
+    ),
+    name: h1 ? h1.innerText.trim() : null,
+    color: color ? color.innerText.trim() : null,
+    image: img ? img.src : null
+};
+"""
+
+# chromedriver is fetched and patched once per process, then reused by every
+# launch; set CHROMEDRIVER_PATH to pin a pre-installed binary instead
+_driver_patcher = None
+_driver_patcher_lock = threading.Lock()
+
+def _chromedriver_path(version_main: int) -> Optional[str]:
+    global _driver_patcher
+    pinned = os.getenv("CHROMEDRIVER_PATH")
+    if pinned:
+        return pinned
+
+    with _driver_patcher_lock:
+        if _driver_patcher is None:
+            try:
+                patcher = uc.Patcher(version_main=version_main)
+                patcher.auto()
+            except Exception as e:
+                logger.warning(f"Could not prepare chromedriver up-front ({e}); leaving it to uc.")
+                return None
+            # Kept referenced: the patcher owns (and on teardown removes) the binary
+            _driver_patcher = patcher
+        return _driver_patcher.executable_path
+
+# Requests Chrome never needs to make for a check. Product image URLs are
+# still read from the DOM; DataDome's own scripts and captcha are left alone
+# since blocking them would itself look like a bot.
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif",
+    "*assets.hermes.com/is/image/*",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*",
+    "*hotjar.com*", "*connect.facebook.net*",
+]
+
+# Every browser profile this bot creates lives under this prefix
+PROFILE_PREFIX = "hermes_bot_"
+# Chrome's HTTP cache outlives the throwaway profiles so relaunches start
+# warm. One slot per concurrently running browser; Chrome can't share one.
+CACHE_ROOT = os.path.join(tempfile.gettempdir(), "hermes_cache")
+CACHE_SIZE_BYTES = 64 * 1024 * 1024
+_cache_slots = set()
+_cache_slots_lock = threading.Lock()
+
+# Patches run before any page script on every document
+STEALTH_JS = """
+Object.defineProperty(navigator, 'plugins', {
+    get: () => [1, 2, 3, 4, 5]
+});
+const originalQuery = window.navigator.permissions.query;
+window.navigator.permissions.query = (parameters) => (
+    parameters.name === 'notifications' ?
+    Promise.resolve({ state: Notification.permission }) :
+    originalQuery(parameters)
+);
+"""
+
+# A long-lived Chrome slowly bloats; relaunch after this many page loads
+# or this many seconds, whichever comes first
+BROWSER_MAX_PAGES = 50
+BROWSER_MAX_AGE = 2 * 60 * 60
+
+# Launch flags and prefs shared by every browser; only the profile dir,
+# window size, user agent and proxy vary per launch
+CHROME_STATIC_ARGS = (
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-setuid-sandbox",
+    "--disable-web-security",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-blink-features=AutomationControlled",
+    "--dns-prefetch-disable",
+    "--disable-ipv6",
+    "--lang=en-GB",
+)
+# Set CHROME_GPU=1 on hosts with a usable GPU to rasterize on it; by default
+# the GPU is disabled so GPU-less servers don't fail over on every launch
+CHROME_GPU = os.getenv("CHROME_GPU", "0") == "1"
+CHROME_GPU_ARGS = ("--enable-gpu-rasterization", "--enable-zero-copy") if CHROME_GPU else ("--disable-gpu",)
+
+# User agents matching Chrome 143 (server version), each paired with a
+# screen size typical for its platform so the fingerprint stays consistent
+PERSONAS = (
+    {"user_agent": 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+     "window_size": (1366, 768)},
+    {"user_agent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+     "window_size": (1920, 1080)},
+    {"user_agent": 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+     "window_size": (1440, 900)},
+)
+# Round-robin from a random start, so pooled browsers get different personas
+_personas = itertools.cycle(random.sample(PERSONAS, k=len(PERSONAS)))
+CHROME_PREFS = {
+    "credentials_enable_service": False,
+    "profile.password_manager_enabled": False,
+    "profile.default_content_setting_values.notifications": 2,
+    "intl.accept_languages": "en-GB,en-US;q=0.9,en;q=0.8",
+}
+
+# Page-source markers of an anti-bot wall (matched case-insensitively)
+BLOCKED_KEYWORDS = (
+    "captcha-delivery.com", "datadome", "access denied",
+    "verify you are a human", "security check"
+)
+
+# All markers as one case-insensitive pattern: a single pass over the page,
+# with no lowercased copy of it
+BLOCK_RE = re.compile("|".join(map(re.escape, BLOCKED_KEYWORDS)), re.IGNORECASE)
+
+# The marker that makes the current page look like an anti-bot wall, or null
+BLOCK_PROBE_JS = """(() => {
+    const title = document.title.match(/blocked|security|captcha/i);
+    if (title) return 'title: ' + title[0];
+    if (/captcha/i.test(location.href)) return 'url: ' + location.href;
+    const found = document.documentElement.outerHTML.match(new RegExp(%s, 'i'));
+    return found ? found[0] : null;
+})()""" % json.dumps(BLOCK_RE.pattern)
+
+# Returned by run_check in place of (found_items, was_blocked, culprit_url)
+# when abort() cut the check short; callers must not count it as a cycle
+CHECK_ABORTED = object()
+
 class BotManager:
     """Manages persistent browser instance and anti-detection measures."""
 
@@ -23,79 +211,74 @@ class BotManager:
         self.proxy = proxy
         self.driver = None
         self.profile_path = None
-
-        # User Agents matching Chrome 143 (Server Version)
-        self.user_agents = [
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36'
-        ]
-        self.current_user_agent = random.choice(self.user_agents)
+        self._cache_slot = None
+        self._browser_pid = None
+        # The driver is used by the worker and torn down from other threads
+        # (restart, shutdown); this serializes the two
+        self._lock = threading.RLock()
+        self._abort = threading.Event()
+        self._launched_at = 0.0
+        self._pages_loaded = 0
+        self.current_user_agent = None
         self._initialize_driver()
 
     def _initialize_driver(self):
         """Initialize Chrome with robust anti-detection settings."""
         try:
             options = uc.ChromeOptions()
+            # driver.get() returns at DOMContentLoaded instead of waiting for
+            # every image and tracker; the checks only need the DOM
+            options.page_load_strategy = "eager"
 
             # -------------------------------------------------
             # 1. PROFILE & DIRECTORY MANAGEMENT
             # -------------------------------------------------
-            self.profile_path = tempfile.mkdtemp(prefix="hermes_bot_")
+            self.profile_path = tempfile.mkdtemp(prefix=PROFILE_PREFIX)
             options.add_argument(f"--user-data-dir={self.profile_path}")
+            options.add_argument(f"--disk-cache-dir={self._claim_cache_dir()}")
+            options.add_argument(f"--disk-cache-size={CACHE_SIZE_BYTES}")
 
             # -------------------------------------------------
             # 2. NETWORK & SECURITY FLAGS
             # -------------------------------------------------
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--disable-setuid-sandbox")
-            options.add_argument("--disable-web-security")
-            options.add_argument("--disable-features=IsolateOrigins,site-per-process")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-
-            options.add_argument("--remote-debugging-port=9222")
-            options.add_argument("--dns-prefetch-disable")
-            options.add_argument("--disable-ipv6")
+            for arg in CHROME_STATIC_ARGS + CHROME_GPU_ARGS:
+                options.add_argument(arg)
 
             # -------------------------------------------------
             # 3. FINGERPRINTING & STEALTH
             # -------------------------------------------------
-            w = random.choice([1366, 1440, 1920])
-            h = random.choice([768, 900, 1080])
+            persona = next(_personas)
+            w, h = persona["window_size"]
             options.add_argument(f"--window-size={w},{h}")
 
-            options.add_argument("--lang=en-GB")
-            self.current_user_agent = random.choice(self.user_agents)
+            self.current_user_agent = persona["user_agent"]
             options.add_argument(f"user-agent={self.current_user_agent}")
 
             if self.proxy and self.proxy.strip():
                 options.add_argument(f'--proxy-server={self.proxy}')
 
-            prefs = {
-                "credentials_enable_service": False,
-                "profile.password_manager_enabled": False,
-                "profile.default_content_setting_values.notifications": 2,
-                "intl.accept_languages": "en-GB,en-US;q=0.9,en;q=0.8",
-            }
-            options.add_experimental_option("prefs", prefs)
+            options.add_experimental_option("prefs", dict(CHROME_PREFS))
 
             # -------------------------------------------------
             # 4. INITIALIZATION
             # -------------------------------------------------
-            chrome_ver = int(os.getenv("CHROME_VERSION", "143"))
-            logger.info(f"Starting Chrome {chrome_ver} with profile {self.profile_path}...")
+            logger.info(f"Starting Chrome {CHROME_VERSION} with profile {self.profile_path}...")
 
             self.driver = uc.Chrome(
                 options=options,
-                version_main=chrome_ver,
-                headless=False,
+                version_main=CHROME_VERSION,
+                headless=HEADLESS,
                 use_subprocess=True,
-                driver_executable_path=None
+                driver_executable_path=_chromedriver_path(CHROME_VERSION)
             )
 
+            self._browser_pid = getattr(self.driver, 'browser_pid', None)
+            self._launched_at = time.monotonic()
+            self._pages_loaded = 0
+            self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+            self.driver.set_script_timeout(SCRIPT_TIMEOUT)
             self._apply_stealth_scripts()
+            self._block_heavy_resources()
             logger.info("Browser initialized successfully.")
 
         except Exception as e:
@@ -103,123 +286,130 @@ class BotManager:
             self.cleanup()
             raise
 
+    def _claim_cache_dir(self) -> str:
+        """Lowest cache slot no other running browser holds; released in cleanup()."""
+        with _cache_slots_lock:
+            slot = 0
+            while slot in _cache_slots:
+                slot += 1
+            _cache_slots.add(slot)
+        self._cache_slot = slot
+        path = os.path.join(CACHE_ROOT, str(slot))
+        os.makedirs(path, exist_ok=True)
+        return path
+
     def _apply_stealth_scripts(self):
         """Apply JavaScript patches."""
-        stealth_scripts = """
-        Object.defineProperty(navigator, 'plugins', {
-            get: () => [1, 2, 3, 4, 5]
-        });
-        const originalQuery = window.navigator.permissions.query;
-        window.navigator.permissions.query = (parameters) => (
-            parameters.name === 'notifications' ?
-            Promise.resolve({ state: Notification.permission }) :
-            originalQuery(parameters)
-        );
-        """
         try:
             self.driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                'source': stealth_scripts
+                'source': STEALTH_JS
             })
         except Exception as e:
             logger.debug(f"Stealth script injection failed: {e}")
 
+    def _block_heavy_resources(self):
+        """Drop image/font/video/tracker requests at the network layer."""
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_RESOURCE_PATTERNS})
+            # Keep the HTTP cache on so scripts/styles are reused across checks
+            self.driver.execute_cdp_cmd('Network.setCacheDisabled', {'cacheDisabled': False})
+        except Exception as e:
+            logger.debug(f"Resource blocking failed: {e}")
+
     def _human_like_delay(self, min_sec=2.0, max_sec=5.0):
         delay = random.uniform(min_sec, max_sec)
-        time.sleep(delay)
+        # Sleeps on the abort flag so a restart doesn't wait out the pause
+        self._abort.wait(delay)
 
     def _random_scroll(self):
         try:
-            scroll_amount = random.randint(300, 700)
-            self.driver.execute_script(f"window.scrollBy(0, {scroll_amount});")
-            time.sleep(random.uniform(0.5, 1.5))
+            # A real wheel event through the input pipeline, not a scripted scrollBy
+            self.driver.execute_cdp_cmd('Input.dispatchMouseEvent', {
+                'type': 'mouseWheel',
+                'x': random.randint(200, 600),
+                'y': random.randint(200, 500),
+                'deltaX': 0,
+                'deltaY': random.randint(300, 700),
+            })
+            self._human_like_delay(0.5, 1.5)
         except Exception as e:
             logger.debug(f"Scroll failed: {e}")
 
-    def _is_blocked(self, page_source=None) -> bool:
+    def _is_blocked(self) -> bool:
         try:
-            if not page_source:
-                page_source = self.driver.page_source
-
-            blocked_keywords = [
-                "captcha-delivery.com", "datadome", "access denied",
-                "verify you are a human", "security check"
-            ]
-
-            if any(k in self.driver.title.lower() for k in ["blocked", "security", "captcha"]):
+            # Scanned inside the page; only the matched marker comes back over the wire.
+            # This goes through CDP, so set_script_timeout() does not bound it.
+            result = self.driver.execute_cdp_cmd('Runtime.evaluate', {
+                'expression': BLOCK_PROBE_JS,
+                'returnByValue': True,
+            })
+            # A throwing script doesn't raise here; CDP reports it alongside
+            # an empty result, which must not read as "not blocked"
+            if 'exceptionDetails' in result:
+                logger.warning(f"Block probe failed: {result['exceptionDetails'].get('text')}")
                 return True
-            if "captcha" in self.driver.current_url.lower():
+            marker = result['result'].get('value')
+            if marker:
+                logger.warning(f"Blocking detected: {marker}")
                 return True
+            return False
 
-            source_lower = page_source.lower()
-            return any(k in source_lower for k in blocked_keywords)
-
-        except Exception:
-            return True
-
-    def _check_unavailability(self) -> bool:
-        try:
-            buttons = self.driver.find_elements(By.XPATH, "//button[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), 'add to cart')]")
-            if buttons:
-                for btn in buttons:
-                    if btn.is_displayed() and btn.is_enabled():
-                        return False
-
-            text_indicators = ["sold out", "out of stock", "no longer available"]
-            page_text = self.driver.find_element(By.TAG_NAME, "body").text.lower()
-            if any(i in page_text for i in text_indicators):
-                return True
-
-            return True
+        except TimeoutException:
+            raise
         except Exception:
             return True
 
-    def _extract_product_details(self, url: str, group_name: str) -> Optional[Dict]:
+    def _probe_product(self) -> Optional[Dict]:
+        """Availability and product fields in one round-trip to the browser."""
         try:
-            name = group_name
-            try:
-                h1 = self.driver.find_element(By.TAG_NAME, "h1")
-                name = h1.text.strip()
-            except:
-                pass
-
-            color = "Unknown"
-            try:
-                elements = self.driver.find_elements(By.XPATH, "//*[contains(@class, 'color') or contains(@class, 'Color')]//span")
-                if elements:
-                    color = elements[0].text.strip()
-            except:
-                pass
-
-            image = ""
-            try:
-                imgs = self.driver.find_elements(By.XPATH, "//img[contains(@src, 'assets.hermes.com')]")
-                if imgs:
-                    image = imgs[0].get_attribute("src")
-                    if image.startswith("//"):
-                        image = "https:" + image
-            except:
-                pass
-
-            return {
-                "name": name,
-                "color": color,
-                "link": url,
-                "image": image,
-                "group": group_name
-            }
+            return self.driver.execute_script(PRODUCT_PROBE_JS) or {}
+        except TimeoutException:
+            # Let check_single_url skip the URL instead of reading it as "no data"
+            raise
         except Exception as e:
-            logger.error(f"Extraction failed: {e}")
+            logger.error(f"Product probe failed: {e}")
             return None
 
+    @staticmethod
+    def _product_details(probe: Dict, url: str, group_name: str) -> Dict:
+        image = probe.get("image") or ""
+        if image.startswith("//"):
+            image = "https:" + image
+
+        return {
+            "name": probe.get("name") or group_name,
+            "color": probe.get("color") or "Unknown",
+            "link": url,
+            "image": image,
+            "group": group_name
+        }
+
     def check_single_url(self, url: str, group_name: str) -> Tuple[Optional[Dict], bool]:
         """
         Check a single URL.
         Returns: (ProductDetails, IsBlocked)
         """
+        entry = _recent.get(url)
+        if entry and time.monotonic() - entry[0] < RECENT_RESULT_TTL:
+            logger.info(f"Checked recently, reusing result: {url}")
+            details = entry[1]
+            return (dict(details, group=group_name) if details else None), False
+
         logger.info(f"Checking: {url}")
         try:
-            self.driver.get(url)
-            self._human_like_delay(3, 6)
+            self._pages_loaded += 1
+            try:
+                self.driver.get(url)
+            except TimeoutException:
+                # Keep whatever DOM has arrived; the probes below judge it
+                logger.debug(f"Page load exceeded {PAGE_LOAD_TIMEOUT}s: {url}")
+                self.driver.execute_script("window.stop();")
+            # Returns as soon as the page is judgeable instead of a fixed pause
+            try:
+                WebDriverWait(self.driver, PAGE_READY_TIMEOUT).until(_page_ready)
+            except TimeoutException:
+                logger.debug(f"No ready signal after {PAGE_READY_TIMEOUT}s: {url}")
 
             if self._is_blocked():
                 logger.error(f"❌ BLOCKED: {url}")
@@ -227,108 +417,362 @@ class BotManager:
 
             self._random_scroll()
 
-            if self._check_unavailability():
+            probe = self._probe_product()
+            if not probe or not probe.get("available"):
                 logger.info(f"Item unavailable: {url}")
+                _recent[url] = (time.monotonic(), None)
                 return None, False
 
-            details = self._extract_product_details(url, group_name)
-            if details:
-                logger.info(f"✓ FOUND: {details['name']}")
-                return details, False
+            details = self._product_details(probe, url, group_name)
+            logger.info(f"✓ FOUND: {details['name']}")
+            _recent[url] = (time.monotonic(), details)
+            return details, False
 
+        except InvalidSessionIdException:
+            raise
+        except TimeoutException as e:
+            # A hung page or script: skip this URL, neither found nor blocked
+            logger.warning(f"Timed out checking {url}: {e}")
             return None, False
-
         except Exception as e:
+            # A dead browser fails every later URL too; let run_check stop.
+            # A dead chromedriver surfaces as a urllib3/socket error, so wrap
+            # it in the one type run_check and BrowserPool catch.
+            if not self.is_alive():
+                if isinstance(e, WebDriverException):
+                    raise
+                raise WebDriverException(f"Browser is gone: {e!r}") from e
             logger.error(f"Error checking {url}: {e}")
             return None, False
 
-    def run_check(self, bag_config: Dict, blacklist: Dict[str, str] = {}) -> Tuple[List[Dict], bool, Optional[str]]:
+    def run_check(self, plan: Sequence[Tuple[str, Sequence[str]]]) -> Tuple[List[Dict], bool, Optional[str]]:
         """
         Main entry point to check all groups.
         Args:
-            bag_config: Config for bags
-            blacklist: Dictionary of {url: timestamp_string}
+            plan: ((group_name, (url, ...)), ...) with paused groups and
+                blacklisted URLs already filtered out by the caller
         Returns:
-            (found_items, was_blocked, culprit_url)
+            (found_items, was_blocked, culprit_url), or CHECK_ABORTED
+        Raises:
+            WebDriverException: the browser died mid-check (it is cleaned up
+                first, so the next call relaunches it)
         """
-        found_items = []
-        was_blocked = False
-        culprit_url = None
-
-        if not self.driver:
-            self._initialize_driver()
+        with self._lock:
+            found_items = []
+            was_blocked = False
+            culprit_url = None
 
-        try:
-            groups = [(k, v) for k, v in bag_config.items() if v.get('active', True)]
-            random.shuffle(groups)
+            self._ensure_driver()
 
-            for group_name, data in groups:
-                urls = data.get('urls', [])
-                random.shuffle(urls)
+            try:
+                # sample() returns shuffled copies; the caller's plan is never touched
+                groups = random.sample(plan, k=len(plan))
 
-                for url in urls:
-                    # --- Blacklist Check ---
-                    if url in blacklist:
-                        try:
-                            blocked_time = datetime.fromisoformat(blacklist[url])
-                            if datetime.now() - blocked_time < timedelta(hours=24):
-                                logger.info(f"⏭️ Skipping blacklisted URL (Time remaining): {url}")
-                                continue
-                            else:
-                                logger.info(f"Blacklist expired for: {url}")
-                                # We don't modify the dict here, app.py handles cleanup
-                        except ValueError:
-                            pass # Invalid date format, try anyway
+                for group_index, (group_name, group_urls) in enumerate(groups):
+                    urls = random.sample(group_urls, k=len(group_urls))
 
-                    # --- Perform Check ---
-                    details, blocked = self.check_single_url(url, group_name)
+                    for url_index, url in enumerate(urls):
+                        if self._abort.is_set():
+                            logger.info("Check aborted for a browser restart.")
+                            return CHECK_ABORTED
 
-                    if blocked:
-                        # Return immediately, identifying the URL that caused it
-                        return found_items, True, url
+                        # --- Perform Check ---
+                        try:
+                            details, blocked = self.check_single_url(url, group_name)
+                        except WebDriverException as e:
+                            # Not a healthy cycle: the worker records it as an error
+                            logger.error(f"Browser died while checking {url}: {e}")
+                            self.cleanup()
+                            raise
+
+                        if blocked:
+                            # Return immediately, identifying the URL that caused it
+                            return found_items, True, url
+
+                        if details:
+                            found_items.append(details)
+
+                        # No pause after the last URL; the group pause follows
+                        if url_index < len(urls) - 1:
+                            self._human_like_delay(5, 10)
+
+                    # Nor after the last group; the worker's sleep follows
+                    if group_index < len(groups) - 1:
+                        self._human_like_delay(10, 20)
+
+            except WebDriverException:
+                raise
+            except Exception as e:
+                logger.error(f"Run loop error: {e}")
+                try:
+                    if self._is_blocked():
+                        was_blocked = True
+                        # If we crashed and are blocked, we might not know exactly which URL,
+                        # but usually it's the current one. For safety, we just return blocked status.
+                except:
+                    pass
+
+            _prune_recent()
+            return found_items, was_blocked, culprit_url
+
+    def is_alive(self) -> bool:
+        """True if the browser still answers WebDriver commands."""
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
 
-                    if details:
-                        found_items.append(details)
+    def _ensure_driver(self):
+        """Reuse the running browser; relaunch if it is missing, dead or worn out."""
+        if self.driver and (self._pages_loaded >= BROWSER_MAX_PAGES
+                            or time.monotonic() - self._launched_at >= BROWSER_MAX_AGE):
+            logger.info(f"Recycling browser after {self._pages_loaded} pages.")
+            self.cleanup()
+        if self.driver and self.is_alive():
+            return
+        if self.driver:
+            logger.warning("Browser stopped responding. Relaunching.")
+            self.cleanup()
+        self._initialize_driver()
 
-                    self._human_like_delay(5, 10)
+    def check_url(self, url: str, group_name: str) -> Tuple[Optional[Dict], bool]:
+        """check_single_url under the driver lock, starting the browser if needed."""
+        with self._lock:
+            self._ensure_driver()
+            return self.check_single_url(url, group_name)
+
+    def abort(self):
+        """Make a running check stop at the next URL (or delay) boundary."""
+        self._abort.set()
+
+    def _wait_for_browser_exit(self, timeout: float = 5):
+        """Block until Chrome has exited and released its profile, killing it after timeout."""
+        pid, self._browser_pid = self._browser_pid, None
+        if not pid:
+            return
+        try:
+            proc = psutil.Process(pid)
+            try:
+                proc.wait(timeout=timeout)
+            except psutil.TimeoutExpired:
+                logger.warning(f"Chrome {pid} ignored quit; killing it.")
+                proc.kill()
+                proc.wait(timeout=timeout)
+        except (psutil.NoSuchProcess, psutil.TimeoutExpired):
+            pass
 
-                self._human_like_delay(10, 20)
+    def cleanup(self):
+        # Waits for a running check to return; call abort() first to hurry it
+        with self._lock:
+            if self.driver:
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                self.driver = None
+                self._wait_for_browser_exit()
+
+            if self.profile_path and os.path.exists(self.profile_path):
+                # A profile is thousands of small files; move it aside and
+                # delete it off this thread. Anything left over (e.g. at
+                # shutdown) still carries PROFILE_PREFIX, so the next
+                # kill_zombie_chrome() sweeps it.
+                trash_path = self.profile_path + ".trash"
+                try:
+                    os.rename(self.profile_path, trash_path)
+                    threading.Thread(target=shutil.rmtree, args=(trash_path,), kwargs={'ignore_errors': True},
+                                     name="profile-gc", daemon=True).start()
+                    logger.info(f"Cleaned up profile: {self.profile_path}")
+                except Exception as e:
+                    logger.error(f"Failed to delete profile {self.profile_path}: {e}")
+            self.profile_path = None
+
+            if self._cache_slot is not None:
+                with _cache_slots_lock:
+                    _cache_slots.discard(self._cache_slot)
+                self._cache_slot = None
+
+class BrowserPool:
+    """
+    Several BotManagers checking URLs in parallel. Exposes the same
+    run_check/abort/cleanup interface as a single BotManager.
+    """
 
-        except Exception as e:
-            logger.error(f"Run loop error: {e}")
+    def __init__(self, proxy: str = None, size: int = 2):
+        self.size = size
+        self._abort = threading.Event()
+        self._managers: List[BotManager] = []
+        self._idle: Queue = Queue()
+        # Chrome startup is seconds of mostly waiting; launch them side by side
+        with ThreadPoolExecutor(max_workers=size, thread_name_prefix="browser-launch") as executor:
+            launches = [executor.submit(BotManager, proxy) for _ in range(size)]
+        failure = None
+        for launch in launches:
             try:
-                if self._is_blocked():
-                    was_blocked = True
-                    # If we crashed and are blocked, we might not know exactly which URL,
-                    # but usually it's the current one. For safety, we just return blocked status.
-            except:
-                pass
+                manager = launch.result()
+            except Exception as e:
+                failure = failure or e
+                continue
+            self._managers.append(manager)
+            self._idle.put(manager)
+        if failure:
+            self.cleanup()
+            raise failure
 
-        return found_items, was_blocked, culprit_url
+    def run_check(self, plan: Sequence[Tuple[str, Sequence[str]]]) -> Tuple[List[Dict], bool, Optional[str]]:
+        """Same contract as BotManager.run_check; URLs are spread over the pool."""
+        # Shuffled across groups so the visit order stays unpredictable
+        jobs = [(group_name, url) for group_name, urls in plan for url in urls]
+        random.shuffle(jobs)
 
-    def cleanup(self):
-        if self.driver:
-            try:
-                self.driver.quit()
-            except Exception:
-                pass
-            self.driver = None
-            time.sleep(1.5)
+        blocked_urls = []
 
-        if self.profile_path and os.path.exists(self.profile_path):
+        def check(group_name: str, url: str) -> Optional[Dict]:
+            manager = self._idle.get()
             try:
-                shutil.rmtree(self.profile_path, ignore_errors=True)
-                logger.info(f"Cleaned up profile: {self.profile_path}")
-            except Exception as e:
-                logger.error(f"Failed to delete profile {self.profile_path}: {e}")
-        self.profile_path = None
+                # After a block (or an abort) the remaining URLs are skipped
+                if blocked_urls or self._abort.is_set():
+                    return None
+                try:
+                    details, blocked = manager.check_url(url, group_name)
+                except WebDriverException as e:
+                    # The next check_url relaunches this manager's browser
+                    logger.error(f"Browser died while checking {url}: {e}")
+                    manager.cleanup()
+                    return None
+                if blocked:
+                    blocked_urls.append(url)
+                    return None
+                self._abort.wait(random.uniform(5, 10))
+                return details
+            finally:
+                self._idle.put(manager)
+
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="browser") as executor:
+            results = list(executor.map(lambda job: check(*job), jobs))
+
+        _prune_recent()
+        # A block still counts even if an abort followed it
+        if self._abort.is_set() and not blocked_urls:
+            return CHECK_ABORTED
+        found_items = [details for details in results if details]
+        if blocked_urls:
+            return found_items, True, blocked_urls[0]
+        return found_items, False, None
+
+    def abort(self):
+        self._abort.set()
+        for manager in self._managers:
+            manager.abort()
+
+    def cleanup(self):
+        for manager in self._managers:
+            manager.cleanup()
+        self._managers = []
 
 # -------------------------------------------------------------------------
 # Standalone Functions
 # -------------------------------------------------------------------------
+def kill_zombie_chrome():
+    """
+    Kill Chrome processes left over from a previous run of this bot and
+    delete their profiles. Only browsers launched with one of our temp
+    profiles are touched; other Chrome instances on the host are left alone.
+    Call before the first BotManager is created.
+    """
+    profile_root = os.path.join(tempfile.gettempdir(), PROFILE_PREFIX)
+    marker = f"--user-data-dir={profile_root}"
+
+    victims = []
+    for proc in psutil.process_iter(['cmdline']):
+        try:
+            if any(arg.startswith(marker) for arg in proc.info['cmdline'] or ()):
+                proc.terminate()
+                victims.append(proc)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+    if victims:
+        _, alive = psutil.wait_procs(victims, timeout=2)
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+        logger.info(f"Killed {len(victims)} leftover Chrome process(es).")
+
+    tmp = tempfile.gettempdir()
+    for name in os.listdir(tmp):
+        if name.startswith(PROFILE_PREFIX):
+            shutil.rmtree(os.path.join(tmp, name), ignore_errors=True)
+
+
+# Styles are declared once in the header; each item only carries class names
+EMAIL_HEADER_HTML = """
+    <style>
+        .alert { font-family: sans-serif; max-width: 600px; margin: auto; }
+        .alert h2 { border-bottom: 2px solid black; }
+        .card { border: 1px solid #ddd; padding: 15px; margin-bottom: 10px; border-radius: 5px; }
+        .btn { background: black; color: white; padding: 10px; text-decoration: none; display: inline-block; border-radius: 4px; }
+    </style>
+    <div class='alert'>
+        <h2>🛍️ Stock Alert</h2>
+    """
+EMAIL_ITEM_HTML = """
+        <div class='card'>
+            <h3>{name}</h3>
+            <p><strong>Color:</strong> {color}</p>
+            <p><a href="{link}" class='btn'>BUY NOW</a></p>
+            {image}
+        </div>
+        """
+EMAIL_IMAGE_HTML = '<img src="{src}" width="150"><br>'
+EMAIL_FOOTER_HTML = "</div>"
+
+# One authenticated SMTP session reused across sends (TLS + AUTH is the slow part)
+_smtp: Optional[smtplib.SMTP] = None
+# Reentrant: send_html_email holds it while calling close_smtp()
+_smtp_lock = threading.RLock()
+# Gmail drops sessions after ~100 messages; roll over before that
+SMTP_MAX_MESSAGES_PER_SESSION = 90
+_smtp_sent = 0
+
+def _smtp_connection(sender: str, password: str) -> smtplib.SMTP:
+    """Return the cached session if the server still answers, else log in afresh."""
+    global _smtp
+    if _smtp is not None and _smtp_sent >= SMTP_MAX_MESSAGES_PER_SESSION:
+        close_smtp()
+    if _smtp is not None:
+        try:
+            if _smtp.noop()[0] == 250:
+                return _smtp
+        except (smtplib.SMTPException, OSError):
+            pass
+        close_smtp()
+
+    server = smtplib.SMTP("smtp.gmail.com", 587, timeout=30)
+    server.starttls()
+    server.login(sender, password)
+    _smtp = server
+    return server
+
+def close_smtp():
+    global _smtp, _smtp_sent
+    # Also called from shutdown(); wait out a send in progress on the sender thread
+    with _smtp_lock:
+        if _smtp is not None:
+            try:
+                _smtp.quit()
+            except Exception:
+                pass
+            _smtp = None
+        _smtp_sent = 0
+
 
 def send_html_email(items: List[Dict], recipients: List[str]):
     """Send email notification."""
+    global _smtp_sent
     if not recipients or not items:
         return
 
@@ -344,30 +788,30 @@ def send_html_email(items: List[Dict], recipients: List[str]):
     msg["From"] = sender
     msg["To"] = ", ".join(recipients)
 
-    html_body = """
-    <div style='font-family: sans-serif; max-width: 600px; margin: auto;'>
-        <h2 style='border-bottom: 2px solid black;'>🛍️ Stock Alert</h2>
-    """
-
+    parts = [EMAIL_HEADER_HTML]
     for item in items:
-        html_body += f"""
-        <div style='border: 1px solid #ddd; padding: 15px; margin-bottom: 10px; border-radius: 5px;'>
-            <h3>{item['name']}</h3>
-            <p><strong>Color:</strong> {item['color']}</p>
-            <p><a href="{item['link']}" style='background: black; color: white; padding: 10px; text-decoration: none; display: inline-block; border-radius: 4px;'>BUY NOW</a></p>
-            {f'<img src="{item["image"]}" width="150"><br>' if item["image"] else ''}
-        </div>
-        """
-
-    html_body += "</div>"
+        # Scraped text goes into markup, so escape it
+        parts.append(EMAIL_ITEM_HTML.format(
+            name=escape(item['name']),
+            color=escape(item['color']),
+            link=escape(item['link']),
+            image=EMAIL_IMAGE_HTML.format(src=escape(item["image"])) if item["image"] else '',
+        ))
+    parts.append(EMAIL_FOOTER_HTML)
+    html_body = "".join(parts)
     msg.set_content("Enable HTML to view items.")
     msg.add_alternative(html_body, subtype='html')
 
-    try:
-        with smtplib.SMTP("smtp.gmail.com", 587, timeout=30) as server:
-            server.starttls()
-            server.login(sender, password)
-            server.send_message(msg)
-        logger.info(f"Email sent to {len(recipients)} recipients.")
-    except Exception as e:
-        logger.error(f"Email failed: {e}")
+    with _smtp_lock:
+        try:
+            try:
+                _smtp_connection(sender, password).send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Dropped between the liveness check and the send; retry once
+                close_smtp()
+                _smtp_connection(sender, password).send_message(msg)
+            _smtp_sent += 1
+            logger.info(f"Email sent to {len(recipients)} recipients.")
+        except Exception as e:
+            close_smtp()
+            logger.error(f"Email failed: {e}")
@@ -0,0 +1,260 @@
+"""
+HTTP-only product checks.
+
+Fetches product pages with a pooled httpx client and parses them with
+selectolax instead of rendering them in Chrome. Opt in with FAST_CHECK=1.
+Pages that answer with a challenge are handed to a browser, when one is
+provided, and its cookies are reused for later plain requests.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from selectolax.parser import HTMLParser
+
+from bot_logic import BLOCK_RE, CHECK_ABORTED
+
+logger = logging.getLogger(__name__)
+
+# Status codes DataDome answers with when it challenges a client
+BLOCKED_STATUSES = (403, 429)
+# Product pages fetched at once; keep it small, the target rate-limits
+CONCURRENCY = 4
+# { url: {"etag": ..., "last_modified": ..., "details": {...} | None} }
+CACHE_FILE = 'http_cache.json'
+
+
+class FastChecker:
+    """Drop-in for BotManager.run_check/cleanup that skips the browser until challenged."""
+
+    def __init__(self, proxy: str = None, user_agent: str = None,
+                 browser_factory: Optional[Callable[[], Any]] = None):
+        self.proxy = proxy.strip() if proxy and proxy.strip() else None
+        # Started on the first challenged page, then kept for later ones
+        self._browser_factory = browser_factory
+        self._browser = None
+        # Private loop kept across cycles so the client's connection pool,
+        # which is bound to the loop it first ran on, stays warm
+        self._loop = asyncio.new_event_loop()
+        # Validators from the last full response per URL, for conditional GETs
+        self._cache: Dict[str, Dict] = self._load_cache()
+        self._cache_dirty = False
+        self._abort = threading.Event()
+        # run_check (worker) and cleanup (restart, shutdown) both drive the
+        # private loop, which can't be entered twice; this serializes them
+        self._lock = threading.Lock()
+        self.client = httpx.AsyncClient(
+            http2=True,
+            timeout=15,
+            follow_redirects=True,
+            proxy=self.proxy,
+            headers={
+                "User-Agent": user_agent or 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-GB,en-US;q=0.9,en;q=0.8",
+            },
+        )
+
+    @staticmethod
+    def _load_cache() -> Dict[str, Dict]:
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error loading HTTP cache: {e}. Starting empty.")
+            return {}
+
+    def _save_cache(self, urls: Sequence[str]):
+        # Forget URLs that are no longer checked so the file stays bounded
+        live = set(urls)
+        cache = {url: entry for url, entry in self._cache.items() if url in live}
+        if not self._cache_dirty and len(cache) == len(self._cache):
+            return
+
+        self._cache = cache
+        tmp_path = CACHE_FILE + ".tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, CACHE_FILE)
+            self._cache_dirty = False
+        except Exception as e:
+            logger.error(f"Failed to save HTTP cache: {e}")
+
+    def _remember(self, url: str, response: httpx.Response, details: Optional[Dict]):
+        etag = response.headers.get('etag')
+        last_modified = response.headers.get('last-modified')
+        if etag or last_modified:
+            self._cache[url] = {"etag": etag, "last_modified": last_modified, "details": details}
+            self._cache_dirty = True
+
+    @staticmethod
+    def _is_blocked(response: httpx.Response) -> bool:
+        if response.status_code in BLOCKED_STATUSES:
+            return True
+        return BLOCK_RE.search(response.text) is not None
+
+    @staticmethod
+    def _is_available(tree: HTMLParser) -> bool:
+        # Same test as PRODUCT_PROBE_JS: an enabled, visible add-to-cart button.
+        # Without layout only the markup can say a button is hidden.
+        for button in tree.css('button'):
+            if 'add to cart' not in button.text().lower():
+                continue
+            attrs = button.attributes
+            if 'disabled' in attrs or attrs.get('aria-disabled') == 'true' or 'hidden' in attrs:
+                continue
+            style = (attrs.get('style') or '').replace(' ', '').lower()
+            if 'display:none' in style or 'visibility:hidden' in style:
+                continue
+            return True
+        return False
+
+    @staticmethod
+    def _extract_product_details(tree: HTMLParser, url: str, group_name: str) -> Dict:
+        h1 = tree.css_first('h1')
+        color = tree.css_first('[class*="color"] span, [class*="Color"] span')
+        img = tree.css_first('img[src*="assets.hermes.com"]')
+
+        image = (img.attributes.get('src') or "") if img else ""
+        if image.startswith("//"):
+            image = "https:" + image
+
+        return {
+            "name": h1.text(strip=True) if h1 else group_name,
+            "color": color.text(strip=True) if color else "Unknown",
+            "link": url,
+            "image": image,
+            "group": group_name
+        }
+
+    async def check_single_url(self, url: str, group_name: str) -> Tuple[Optional[Dict], bool]:
+        """
+        Check a single URL.
+        Returns: (ProductDetails, IsBlocked)
+        """
+        logger.info(f"Checking (http): {url}")
+        cached = self._cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        try:
+            response = await self.client.get(url, headers=headers)
+        except httpx.HTTPError as e:
+            logger.error(f"Error checking {url}: {e}")
+            return None, False
+
+        if response.status_code == 304 and cached:
+            logger.info(f"Unchanged since last check: {url}")
+            return cached['details'], False
+
+        if self._is_blocked(response):
+            logger.error(f"❌ BLOCKED: {url}")
+            return None, True
+
+        tree = HTMLParser(response.text)
+        if not self._is_available(tree):
+            logger.info(f"Item unavailable: {url}")
+            self._remember(url, response, None)
+            return None, False
+
+        details = self._extract_product_details(tree, url, group_name)
+        self._remember(url, response, details)
+        logger.info(f"✓ FOUND: {details['name']}")
+        return details, False
+
+    async def _check_all(self, jobs: Sequence[Tuple[str, str]]
+                         ) -> Tuple[List[Dict], Optional[str], List[Tuple[str, str]]]:
+        """Returns (found_items, first_blocked_url, jobs blocked or left unchecked)."""
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+        blocked_url = None
+        unchecked = []
+
+        async def check(group_name: str, url: str) -> Optional[Dict]:
+            nonlocal blocked_url
+            async with semaphore:
+                if self._abort.is_set():
+                    return None
+                # After a block, leave the queued URLs to the browser
+                if blocked_url:
+                    unchecked.append((group_name, url))
+                    return None
+                details, blocked = await self.check_single_url(url, group_name)
+                if blocked:
+                    unchecked.append((group_name, url))
+                    if blocked_url is None:
+                        blocked_url = url
+                # Plain requests are cheap; keep a short gap per slot so the
+                # traffic pattern doesn't look like a crawler
+                await asyncio.sleep(random.uniform(1, 3))
+                return details
+
+        results = await asyncio.gather(*(check(group_name, url) for group_name, url in jobs))
+        return [details for details in results if details], blocked_url, unchecked
+
+    def _escalate(self, jobs: Sequence[Tuple[str, str]]) -> Tuple[List[Dict], bool, Optional[str]]:
+        """Check challenged URLs in the browser, then borrow its session for plain requests."""
+        if self._browser is None:
+            self._browser = self._browser_factory()
+
+        plan: Dict[str, List[str]] = {}
+        for group_name, url in jobs:
+            plan.setdefault(group_name, []).append(url)
+        outcome = self._browser.run_check(list(plan.items()))
+
+        # A solved challenge sets cookies bound to the browser's user agent
+        driver = getattr(self._browser, 'driver', None)
+        if driver is not None:
+            try:
+                for cookie in driver.get_cookies():
+                    self.client.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''))
+                self.client.headers['User-Agent'] = self._browser.current_user_agent
+            except Exception as e:
+                logger.debug(f"Could not copy browser cookies: {e}")
+        return outcome
+
+    def run_check(self, plan: Sequence[Tuple[str, Sequence[str]]]) -> Tuple[List[Dict], bool, Optional[str]]:
+        """Same contract as BotManager.run_check, with up to CONCURRENCY fetches in flight."""
+        jobs = [(group_name, url) for group_name, urls in plan for url in urls]
+        random.shuffle(jobs)
+
+        with self._lock:
+            found_items, blocked_url, unchecked = self._loop.run_until_complete(self._check_all(jobs))
+            self._save_cache([url for _, url in jobs])
+
+            if self._abort.is_set() and not blocked_url:
+                return CHECK_ABORTED
+            if blocked_url and self._browser_factory and not self._abort.is_set():
+                logger.warning(f"Challenged at {blocked_url}; checking {len(unchecked)} URLs in the browser.")
+                outcome = self._escalate(unchecked)
+                if outcome is CHECK_ABORTED:
+                    return outcome
+                browser_items, was_blocked, culprit_url = outcome
+                return found_items + browser_items, was_blocked, culprit_url
+            return found_items, blocked_url is not None, blocked_url
+
+    def abort(self):
+        self._abort.set()
+        if self._browser:
+            self._browser.abort()
+
+    def cleanup(self):
+        # Waits for a running check to return; call abort() first to hurry it
+        with self._lock:
+            if self._browser:
+                self._browser.cleanup()
+                self._browser = None
+            if not self._loop.is_closed():
+                self._loop.run_until_complete(self.client.aclose())
+                self._loop.close()
@@ -0,0 +1,12 @@
+"""
+WSGI entry point.
+
+    waitress-serve --threads=4 --port=5000 wsgi:app
+    gunicorn -w 1 --threads 4 -b 0.0.0.0:5000 wsgi:app
+
+Keep it to one worker process: each process runs its own bot worker and
+browser, and they would race on config.json.
+"""
+from app import app, start_services
+
+start_services()